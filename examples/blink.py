@@ -1,22 +1,14 @@
-from collections import namedtuple
 from amaranth import *
 from amaranth.build import Resource, Pins
 from amaranth.cli import main
 from amaranth.sim import *
 from amaranth_boards.icestick import ICEStickPlatform
-import warnings
 
-import sys
-# works if run from repo root
-sys.path.append(".")
-# works if run from examples dir
-sys.path.append("..")
-from pulser import PulseStep, PLL, Trigger
+from pulser import PatternPlayer, PLL, Trigger
 
 
 class Top(Elaboratable):
     def __init__(self):
-        self.start = Signal()
         self.enable = Signal()
 
     def elaborate(self, platform):
@@ -46,57 +38,40 @@ class Top(Elaboratable):
         # Override default sync domain
         m.domains += pll.domain
 
-        tstep = 1 / (freq_out * 1e6)
-
+        # Convert times in seconds to cycles, rounding so that float error
+        # can't lose a cycle, and never below the minimum duration of 1
         def t2c(t):
-            return int(t/tstep)
+            return max(1, round(t * freq_out * 1e6))
+
+        # One second per step, computed once
+        step = t2c(1)
 
         # Example pulse train
-        p1 = PulseStep(1)
-        p2 = PulseStep(204 * 1000000)  # HI
-        p3 = PulseStep(204 * 1000000)
-        p4 = PulseStep(204 * 1000000)  # HI
-        p5 = PulseStep(204 * 1000000)
-        p6 = PulseStep(204 * 1000000)  # HI
+        pp = PatternPlayer([
+            1,
+            step,  # HI
+            step,
+            step,  # HI
+            step,
+            step,  # HI
+        ])
 
         # Trigger to start pulse train
-        t = Trigger(6 * 204 * 1000000)
+        t = Trigger(6 * step)
 
         m.submodules += [
             pll,
             t,
-            p1,
-            p2,
-            p3,
-            p4,
-            p5,
-            p6,
+            pp,
         ]
 
         m.d.comb += [
             pll.clk_pin.eq(clk_pin),
             t.trig_in.eq(C(1)),
-            p1.input.eq(self.start),
-            p1.prev.eq(t.trigger),
-            p1.en.eq(t.trigger),
-            p2.input.eq(p1.output),
-            p2.prev.eq(p1.next),
-            p2.en.eq(t.trigger),
-            p3.input.eq(p2.output),
-            p3.prev.eq(p2.next),
-            p3.en.eq(t.trigger),
-            p4.input.eq(p3.output),
-            p4.prev.eq(p3.next),
-            p4.en.eq(t.trigger),
-            p5.input.eq(p4.output),
-            p5.prev.eq(p4.next),
-            p5.en.eq(t.trigger),
-            p6.input.eq(p5.output),
-            p6.prev.eq(p5.next),
-            p6.en.eq(t.trigger),
-            con1.eq(p6.output),
-
-            led.eq(p6.output),
+            pp.en.eq(t.trigger),
+            con1.eq(pp.out),
+
+            led.eq(pp.out),
             led1.eq(off),
             led2.eq(off),
             led3.eq(off),
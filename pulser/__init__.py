@@ -1,3 +1,4 @@
+from .patternplayer import PatternPlayer
 from .pll import PLL
-from .pulsestep import PulseStep
+from .pulsestep import PulseChain, PulseStep
 from .trigger import Trigger
@@ -0,0 +1,154 @@
+from amaranth import *
+from amaranth.cli import main
+from amaranth.sim import *
+
+
+# Duration tables bigger than this many bits go in a block RAM. On the iCE40,
+# smaller tables are faster and no bigger as logic, since the block RAM's
+# clock to output delay ends up on the critical path.
+_BRAM_MIN_BITS = 512
+
+
+class PatternPlayer(Elaboratable):
+    """Pulse sequence player with a single shared counter.
+
+    Parameters
+    ----------
+    durations : list of int
+        Duration of each pulse step (minimum 1)
+
+    Attributes
+    ----------
+    en: in
+        Enable. For sequences long enough to be stored in block RAM, this
+        must be low for the first cycle after configuration, while the read
+        port is primed.
+    out: out
+        Output state, starting low and toggled after each duration. This is
+        driven directly from a flop.
+
+    Playback
+    --------
+    ```
+               +-----+  idx+1  +-------+
+    en ------> | idx | ------> |  mem  |
+               +-----+         +-------+
+                  ^                |
+                  |                v
+    out <------ [~]out <------ {ctr}?
+    ```
+    This behaves like a chain of PulseStep instances with the same durations,
+    but only one step is ever counting at a time, so one counter is enough,
+    and there is no cycle of latency per step. The durations are stored in a
+    memory indexed by the current step. When the counter reaches -1 the
+    output is toggled, the step index is incremented, and the counter is
+    reloaded with the next duration. Dropping en resets playback on the next
+    cycle.
+
+    The counter only has to be as wide as the longest duration, rather than
+    their sum, which keeps its carry chain and the reload mux short for the
+    many short steps of a typical sequence.
+    """
+
+    def __init__(self, durations):
+        self.durations = list(durations)
+        self.en = Signal()
+        self.out = Signal()
+
+        self.ports = [
+            self.en,
+            self.out,
+        ]
+
+    def elaborate(self, platform):
+        # Count down and terminate at -1, so that we only monitor the MSB.
+        # Unlike PulseStep, an unsigned counter with a terminal count flag is
+        # no smaller here: the flag has to be reloaded with every duration,
+        # and its zero test costs more logic than the sign bit it replaces.
+        # Loading the counter and registering out each take a cycle, so store
+        # each duration less two to toggle exactly on time.
+        ctr = Signal(range(-1, max(self.durations) - 1),
+                     reset=(self.durations[0] - 2))
+        idx = Signal(range(len(self.durations) + 1))
+        mem = Memory(
+            width=len(ctr),
+            depth=len(self.durations),
+            init=[d - 2 for d in self.durations],
+        )
+
+        m = Module()
+
+        # The next value of idx, read by the block RAM port below
+        idx_next = Signal.like(idx)
+
+        if mem.depth * mem.width > _BRAM_MIN_BITS:
+            # A large table is cheaper in a block RAM than in logic. Block RAM
+            # reads are synchronous, with the data lagging the address by a
+            # cycle, so address it with the next step's index.
+            m.submodules.rdport = rdport = mem.read_port()
+            m.d.comb += [
+                rdport.addr.eq(idx_next + 1),
+            ]
+        else:
+            m.submodules.rdport = rdport = mem.read_port(domain="comb")
+            m.d.comb += [
+                rdport.addr.eq(idx + 1),
+            ]
+
+        m.d.comb += [
+            idx_next.eq(idx),
+        ]
+        with m.If(self.en):
+            with m.If(idx != len(self.durations)):
+                with m.If(ctr[-1]):
+                    # Finished counting, toggle and load next step
+                    m.d.sync += [
+                        self.out.eq(~self.out),
+                        ctr.eq(rdport.data),
+                    ]
+                    m.d.comb += [
+                        idx_next.eq(idx + 1),
+                    ]
+                with m.Else():
+                    m.d.sync += [
+                        # Decrement counter
+                        ctr.eq(ctr - 1),
+                    ]
+        with m.Else():
+            # Continuously reset if disabled
+            m.d.sync += [
+                self.out.eq(0),
+                ctr.eq(self.durations[0] - 2),
+            ]
+            m.d.comb += [
+                idx_next.eq(0),
+            ]
+        m.d.sync += [
+            idx.eq(idx_next),
+        ]
+
+        return m
+
+
+if __name__ == '__main__':
+    dut = PatternPlayer([1, 2, 3, 4])
+    def bench():
+        # Run a few cycles
+        for _ in range(3):
+            yield
+        # Run the pulse event twice
+        for _ in range(2):
+            # Start the pulse event and wait until it's done
+            yield dut.en.eq(1)
+            for _ in range(sum(dut.durations) + 3):
+                yield
+            # Reset
+            yield dut.en.eq(0)
+            for _ in range(9):
+                yield
+
+    sim = Simulator(dut)
+    sim.add_clock(1e-6, domain="sync")
+    sim.add_sync_process(bench)
+    with sim.write_vcd("patternplayer.vcd"):
+        sim.run()
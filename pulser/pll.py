@@ -3,8 +3,59 @@ from amaranth.lib.cdc import ResetSynchronizer
 from amaranth.cli import main
 from amaranth.sim import *
 from collections import namedtuple
+import functools
+import math
 import warnings
-        
+
+
+coefficients = namedtuple('coefficients', 'divr divf divq')
+
+
+@functools.lru_cache(maxsize=None)
+def _calc_pll_coeffs(f_in, f_req):
+    # cribbed from Icestorm's icepll. This only depends on the frequencies, so
+    # cache it for designs that build several PLLs with the same ones.
+    assert 10 <= f_in <= 13
+    assert 16 <= f_req <= 275
+    divf_range = 128        # see comments in icepll.cc
+    best_fout = float('inf')
+    best_err = float('inf')
+    for divr in range(16):
+        pfd = f_in / (divr + 1)
+        if 10 <= pfd <= 133:
+            # Range of divf keeping the VCO in spec
+            divf_min = max(0, math.ceil(533 / pfd) - 1)
+            divf_max = min(divf_range - 1, math.floor(1066 / pfd) - 1)
+            for divq in range(1, 7):
+                div = 1 << divq
+                # fout grows linearly with divf, so the best divf is one
+                # either side of the exact solution, clamped to the range
+                exact = f_req * div / pfd - 1
+                divfs = sorted({
+                    min(max(divf, divf_min), divf_max)
+                    for divf in (math.floor(exact), math.ceil(exact))
+                })
+                for divf in divfs:
+                    vco = pfd * (divf + 1)
+                    if 533 <= vco <= 1066:
+                        fout = vco / div
+                        err = abs(fout - f_req)
+                        # Break ties in the same (divr, divf, divq) order as
+                        # icepll's exhaustive search
+                        if (err < best_err
+                                or err == best_err
+                                and (divr, divf, divq) < best):
+                            best_fout = fout
+                            best_err = err
+                            best = coefficients(divr, divf, divq)
+                        # Nothing can beat an exact match. divf grows with
+                        # divq, so the first found is also first in icepll's
+                        # order.
+                        if err == 0:
+                            return best, best_fout
+    return best, best_fout
+
+
 class PLL(Elaboratable):
     """Set the PLL to produce a higher-frequency clock.
 
@@ -20,11 +71,17 @@ class PLL(Elaboratable):
     [e1]: https://github.com/tpwrules/tasha_and_friends/blob/eventuator/tasha/gateware/icebreaker/pll.py
     [e2]: https://github.com/kbob/nmigen-examples/blob/master/nmigen_lib/pll.py
     [b]: http://41j.com/blog/2020/01/nmigen-pll-ice40hx8k-hx1k/
+
+    pysim has no model for the PLL primitive, so with `sim=True` the PLL
+    elaborates to nothing, and a testbench can drive the domain's clock with
+    `add_clock` instead. Leave it False for anything that is built or
+    converted to RTLIL or Verilog, or the output will have no PLL.
     """
 
-    def __init__(self, freq_in, freq_out, domain_name="sync"):
+    def __init__(self, freq_in, freq_out, domain_name="sync", sim=False):
         self.freq_in = freq_in
         self.freq_out = freq_out
+        self.sim = sim
         self.coeff = self._calc_freq_coefficients()
         
         self.clk_pin = Signal()
@@ -39,24 +96,8 @@ class PLL(Elaboratable):
         ]
 
     def _calc_freq_coefficients(self):
-        # cribbed from Icestorm's icepll.
-        f_in, f_req = self.freq_in, self.freq_out
-        assert 10 <= f_in <= 13
-        assert 16 <= f_req <= 275
-        coefficients = namedtuple('coefficients', 'divr divf divq')
-        divf_range = 128        # see comments in icepll.cc
-        best_fout = float('inf')
-        for divr in range(16):
-            pfd = f_in / (divr + 1)
-            if 10 <= pfd <= 133:
-                for divf in range(divf_range):
-                    vco = pfd * (divf + 1)
-                    if 533 <= vco <= 1066:
-                        for divq in range(1, 7):
-                            fout = vco * 2**-divq
-                            if abs(fout - f_req) < abs(best_fout - f_req):
-                                best_fout = fout
-                                best = coefficients(divr, divf, divq)
+        f_req = self.freq_out
+        best, best_fout = _calc_pll_coeffs(self.freq_in, f_req)
         if best_fout != f_req:
             warnings.warn(
                 f'PLL: requested {f_req} MHz, got {best_fout} MHz)',
@@ -64,6 +105,14 @@ class PLL(Elaboratable):
         return best
 
     def elaborate(self, platform):
+        m = Module()
+
+        # There is no PLL primitive in simulation, and the simulator drives
+        # the domain clock itself with add_clock(). Instantiating it anyway
+        # would leave the lock undriven, holding the domain in reset.
+        if self.sim:
+            return m
+
         pll_lock = Signal()
         pll = Instance(
             "SB_PLL40_CORE",
@@ -84,8 +133,6 @@ class PLL(Elaboratable):
 
         rs = ResetSynchronizer(~pll_lock, domain=self.domain_name)
 
-        m = Module()
-
         m.submodules += [
             pll,
             rs,
@@ -13,16 +13,15 @@ class PulseStep(Elaboratable):
 
     Attributes
     ----------
-    en: in
-        Enable
     input: in
         Input state
     prev: in
-        Chained counter trigger input
+        Chained counter trigger input, resetting the step when low
     output: out
-        Output state, buffered before countdown, inverted after
+        Output state, buffered before countdown, inverted after. Registered,
+        so it follows input a cycle late.
     next: out
-        Chained counter trigger output
+        Chained counter trigger output, a cycle after output is inverted
 
     Chaining
     --------
@@ -31,30 +30,42 @@ class PulseStep(Elaboratable):
     0  --> | input->[~]-->output | --> | input->[~]-->output | --> pulse_out
            |         ^           |     |          ^          |
            |         |           |     |          |          |
-    1  --> | prev->{ctr0}?->next | --> | prev->{ctr1}?->next | --> _
+    en --> | prev->{ctr0}?->next | --> | prev->{ctr1}?->next | --> _
            +---------------------+     +---------------------+
-                     |                           |
-    en --------------+---------------------------+
     ```
     Starting from an initial state 0, the state of pulse_out is toggled every
     dur_j cycles by subsequent chained PulseStep instances. ctr(j+1) is started
     when prev is high, controlled by the jth instance setting next to high when
-    ctrj = -1. Chaining these allows a (nearly) arbitrary binary output pulse
-    sequence, except that the initial delay is a minimum of 1 cycle. Using a
-    global en in addition to prev and next ensures that resetting is
-    instantaneous.
+    ctrj reaches 0. Chaining these allows a (nearly) arbitrary binary output
+    pulse sequence, except that the initial delay is a minimum of 1 cycle.
+
+    Every output is registered, so there is no combinational path along the
+    chain. Each step delays the signals passing through it by a cycle, so
+    a chain of N steps delays the whole sequence by N cycles. Dropping en
+    resets the chain, and the output returns to its initial state N + 1
+    cycles later.
     """
 
     def __init__(self, duration):
         self.duration = duration + 1
-        self.en = Signal()
+
+        # The counter only ever resets to one value, which depends on nothing
+        # but the duration, so work out the width and reset value of each
+        # counter word once here. See elaborate() for why the counter is
+        # split.
+        width = Shape.cast(range(self.duration - 1)).width
+        reset = self.duration - 2
+        self._lo_width = min(16, width)
+        self._hi_width = width - self._lo_width
+        self._lo_reset = reset & ((1 << self._lo_width) - 1)
+        self._hi_reset = reset >> self._lo_width
+
         self.input = Signal()
         self.output = Signal()
         self.prev = Signal()
         self.next = Signal()
 
         self.ports = [
-            self.en,
             self.input,
             self.output,
             self.prev,
@@ -62,32 +73,111 @@ class PulseStep(Elaboratable):
         ]
 
     def elaborate(self, platform):
-        # It seems cheap on FPGAs to only check one bit of a number instead of
-        # some arbitrary value, so loops often count down and terminate at -1,
-        # where you can just monitor the MSB of a signed signal to check if
-        # it is negative.
+        # Count down to 0, then set a terminal count flag, so the rest of the
+        # design only has to monitor a single bit. An unsigned counter is one
+        # bit narrower than a signed one terminating at -1.
+
+        # A single wide counter has a long carry chain, which limits the clock
+        # speed for long durations. Instead, split it into a low word and a
+        # high word that is decremented when the low word wraps. The borrow
+        # is registered one cycle early, so the high word updates on the same
+        # edge that the low word wraps, and only the low word's carry chain is
+        # between flops.
+        ctr_lo = Signal(self._lo_width, reset=self._lo_reset)
+        ctr_hi = Signal(self._hi_width, reset=self._hi_reset)
+        lo_borrow = Signal(reset=(self._lo_reset == 0))
+        tc = Signal()
+
+        finish = lo_borrow & (ctr_hi == 0)
+
+        counter = Module()
+        counter.d.sync += [
+            # Decrement counter
+            ctr_lo.eq(ctr_lo - 1),
+            ctr_hi.eq(ctr_hi - lo_borrow),
+            lo_borrow.eq(ctr_lo == 1),
+        ]
 
-        # We can use a range() to set the signal's shape automatically
-        ctr = Signal(range(-1, self.duration - 1), reset=(self.duration - 2))
+        step = Module()
+
+        # Stop counting once finished. Using EnableInserter and ResetInserter
+        # rather than If/Else lets these map to the clock enable and reset
+        # inputs of the flops instead of muxes in front of them.
+        step.submodules.counter = EnableInserter({"sync": ~finish})(counter)
+
+        step.d.sync += [
+            # Finished counting
+            tc.eq(finish),
+            # Delay next by a cycle to match the registered output below
+            self.next.eq(tc),
+        ]
 
         m = Module()
 
-        m.d.comb += [
-            self.next.eq(ctr[-1]),
-            self.output.eq((self.input) ^ ((self.en) & (self.next))),
+        # Continuously reset if disabled
+        m.submodules.step = ResetInserter({"sync": ~self.prev})(step)
+
+        # Register the output, so that a chain has no combinational path
+        # through its outputs. Each step adds a cycle of latency to its input,
+        # and delays the start of the next step by a cycle, so the transitions
+        # of an N step chain are all delayed by N cycles.
+        m.d.sync += [
+            self.output.eq((self.input) ^ tc),
         ]
-        with m.If(self.prev):
-            # Finished counting
-            with m.If(~ctr[-1]):
-                m.d.sync += [
-                    # Decrement counter
-                    ctr.eq(ctr - 1),
-                ]
-        with m.Else():
-            # Continuously reset if disabled
-            m.d.sync += [
-                ctr.eq(self.duration - 2),
+
+        return m
+
+
+class PulseChain(Elaboratable):
+    """Chain of PulseStep instances.
+
+    Parameters
+    ----------
+    durations : list of int
+        Duration of each pulse step (minimum 1)
+
+    Attributes
+    ----------
+    en: in
+        Enable, starting the first step
+    input: in
+        Initial state
+    output: out
+        Output state of the last step, delayed by one cycle per step
+
+    Builds and wires up the whole chain in a single elaborate() call, rather
+    than the user instantiating and connecting each PulseStep by hand.
+    """
+
+    def __init__(self, durations):
+        self.durations = list(durations)
+        self.en = Signal()
+        self.input = Signal()
+        self.output = Signal()
+
+        self.ports = [
+            self.en,
+            self.input,
+            self.output,
+        ]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        steps = [PulseStep(duration) for duration in self.durations]
+        m.submodules += steps
+
+        stmts = [
+            steps[0].input.eq(self.input),
+            steps[0].prev.eq(self.en),
+            self.output.eq(steps[-1].output),
+        ]
+        for prev, step in zip(steps, steps[1:]):
+            stmts += [
+                step.input.eq(prev.output),
+                step.prev.eq(prev.next),
             ]
+        m.d.comb += stmts
 
         return m
 
@@ -97,6 +187,7 @@ if __name__ == '__main__':
         def __init__(self):
             self.init = Signal()
             self.enable = Signal()
+            self.done = Signal()
 
         def elaborate(self, platform):
             m = Module()
@@ -116,16 +207,13 @@ if __name__ == '__main__':
             m.d.comb += [
                 p1.input.eq(self.init),
                 p1.prev.eq(self.enable),
-                p1.en.eq(self.enable),
                 p2.input.eq(p1.output),
                 p2.prev.eq(p1.next),
-                p2.en.eq(self.enable),
                 p3.input.eq(p2.output),
                 p3.prev.eq(p2.next),
-                p3.en.eq(self.enable),
                 p4.input.eq(p3.output),
                 p4.prev.eq(p3.next),
-                p4.en.eq(self.enable),
+                self.done.eq(p4.next),
             ]
 
             return m
@@ -135,18 +223,19 @@ if __name__ == '__main__':
         # Run a few cycles
         for _ in range(3):
             yield
-        # Start the pulse event
-        yield dut.enable.eq(1)
-        # Wait until it's done, reset, and redo
-        for _ in range(13):
-            yield
-        yield dut.enable.eq(0)
-        for _ in range(9):
-            yield
-        yield dut.enable.eq(1)
+        # Run the pulse event twice
+        for _ in range(2):
+            # Start the pulse event and wait until it's done
+            yield dut.enable.eq(1)
+            while not (yield dut.done):
+                yield
+            # Reset
+            yield dut.enable.eq(0)
+            for _ in range(9):
+                yield
 
     sim = Simulator(dut)
     sim.add_clock(1e-6, domain="sync")
     sim.add_sync_process(bench)
     with sim.write_vcd("pulsestep.vcd"):
-        sim.run_until(40e-6, run_passive=True)
+        sim.run()
@@ -3,13 +3,19 @@ from amaranth.cli import main
 from amaranth.sim import *
 
 class Trigger(Elaboratable):
-    """Monitor input for a rising edge.
+    """Monitor input for a trigger event.
 
     Parameters
     ----------
     block: int
         Period to hold the trigger output high. Input events are ignored during
         this time.
+    mode: str
+        Trigger event to monitor for. "edge" triggers on a rising edge of the
+        input, "streak" triggers once the input has been high for `count`
+        consecutive cycles.
+    count: int
+        Length of the input streak in "streak" mode (minimum 1)
 
     Attributes
     ----------
@@ -18,8 +24,11 @@ class Trigger(Elaboratable):
     trigger: out
         Signal to set hi for trigger events.
     """
-    def __init__(self, block):
+    def __init__(self, block, mode="edge", count=1):
+        assert mode in ("edge", "streak")
         self.block = block
+        self.mode = mode
+        self.count = count
         self.trig_in = Signal()
         self.trigger = Signal()
 
@@ -31,36 +40,72 @@ class Trigger(Elaboratable):
     def elaborate(self, platform):
         m = Module()
 
-        state = Signal()
+        cur = Signal()
         lst = Signal()
 
+        # Only one of the streak and the trigger is counted at a time, so in
+        # "streak" mode they share one counter, wide enough for either. It
+        # idles at the start of a streak, and is reloaded to count down the
+        # trigger on an event.
         trig_max = self.block - 2
-        trig_ctr = Signal(range(-1, self.block - 1), reset=trig_max)
+        if self.mode == "edge":
+            idle_max = trig_max
+            ctr = Signal(range(-1, self.block - 1), reset=trig_max)
+        else:
+            idle_max = self.count - 2
+            ctr = Signal(range(-1, max(self.block, self.count) - 1),
+                         reset=idle_max)
+
+        # Register the input before using it, so the event logic only sees
+        # the output of a flop
+        m.d.sync += [
+            cur.eq(self.trig_in),
+        ]
 
         # When not triggered, monitor input
         with m.If(~self.trigger):
-            # Monitor current and last input states
-            m.d.sync += [
-                lst.eq(self.trig_in),
-            ]
-            # Check for rising edge
-            with m.If((self.trig_in == 1) & (lst == 0)):
+            if self.mode == "edge":
+                # Monitor current and last input states
+                m.d.sync += [
+                    lst.eq(cur),
+                ]
+                # Check for rising edge
+                event = cur & ~lst
+            else:
+                with m.If(cur & ~ctr[-1]):
+                    m.d.sync += [
+                        # count down input streak
+                        ctr.eq(ctr - 1),
+                    ]
+                with m.Else():
+                    # restart streak on low input
+                    m.d.sync += [
+                        ctr.eq(idle_max),
+                    ]
+                # Check for complete streak
+                event = cur & ctr[-1]
+            with m.If(event):
                 m.d.sync += [
                     # trigger event
                     self.trigger.eq(1),
                 ]
+                if idle_max != trig_max:
+                    m.d.sync += [
+                        # start counting down the trigger instead
+                        ctr.eq(trig_max),
+                    ]
         # When triggered:
         with m.Else():
-            with m.If(trig_ctr[-1]):
+            with m.If(ctr[-1]):
                 # trigger finished, allow new trigger
                 m.d.sync += [
                     self.trigger.eq(0),
-                    trig_ctr.eq(trig_max),
+                    ctr.eq(idle_max),
                 ]
             with m.Else():
                 # count down trigger
                 m.d.sync += [
-                    trig_ctr.eq(trig_ctr - 1),
+                    ctr.eq(ctr - 1),
                 ]
 
         return m
@@ -116,10 +161,13 @@ if __name__ == '__main__':
         yield
         yield
         yield dut.enable.eq(0)
+        # Wait until the trigger is finished
+        while (yield dut.trig_mon):
+            yield
         yield
 
     sim = Simulator(dut)
     sim.add_clock(1e-6, domain="sync")
     sim.add_sync_process(bench)
     with sim.write_vcd("trigger.vcd"):
-        sim.run_until(40e-6, run_passive=True)
+        sim.run()